@@ -1,8 +1,92 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
-from utilities import split_state, state_to_abbr, code_to_str
+import pyarrow.parquet as pq
+from utilities import (split_state, state_to_abbr, code_to_str,
+                       write_parquet_cache)
 
 
-class ACSCountyReader():
+# _OG indicates the column name in original table
+# These are followed by new column name in the assignment
+FIPS_COL_OG, FIPS_COL = 'Id2', 'FIPS'
+GEO_COL_OG, GEO_COL = 'Geography', 'County'
+
+# column prefixes used by ACS»
+EST_PRE, MOE_PRE = 'Estimate; ', 'Margin of Error; '
+# suffix for renamed columns
+EST_SUF, MOE_SUF = '', '_Moe'
+
+TOT_EST_OG, TOT_EST = EST_PRE + 'Total', 'Tot' + EST_SUF
+TOT_MOE_OG, TOT_MOE = MOE_PRE + 'Total', 'Tot' + MOE_SUF
+
+GEN_COLS_OG = [FIPS_COL_OG, GEO_COL_OG, TOT_EST_OG, TOT_MOE_OG]
+GEN_COLS = [FIPS_COL, GEO_COL, TOT_EST, TOT_MOE]
+
+TO_DROP = ['Id']  # never necessary
+
+
+def _read_table(fp, cache=True, kw=None, total=True, moe=False, geo=False):
+    """Reads only the columns read_acs_counties can keep.
+
+    General columns and those matching kw, less the geography
+    and total columns unless they are included.
+
+    If cache is True, a Parquet copy of a .csv table is written
+    beside it on first read, and read from thereafter. If the copy
+    cannot be written, columns are taken from the table already read.
+    """
+    root, ext = os.path.splitext(fp)
+    cache_fp = root + '.parquet' if cache and ext == '.csv' else None
+    full_df = None
+
+    # rewrite cache if missing or older than the table
+    if cache_fp is not None and (
+            not os.path.exists(cache_fp) or
+            os.path.getmtime(cache_fp) < os.path.getmtime(fp)):
+        full_df = pd.read_csv(fp, header=1, encoding='latin',
+                              engine='pyarrow', dtype={FIPS_COL_OG: str})
+        if write_parquet_cache(full_df, cache_fp):
+            full_df = None
+        else:
+            cache_fp = None  # select from the table already read
+
+    if full_df is not None:
+        header = full_df.columns
+    elif cache_fp is None:
+        header = pd.read_csv(fp, header=1, nrows=0, encoding='latin').columns
+    else:
+        header = pq.read_schema(cache_fp).names
+
+    to_skip = set(TO_DROP)
+    if not geo:
+        to_skip.add(GEO_COL_OG)
+    if not total:
+        to_skip.update([TOT_EST_OG, TOT_MOE_OG])
+    elif not moe:
+        to_skip.add(TOT_MOE_OG)
+
+    usecols = [x for x in header if x.strip(':') not in to_skip and (
+               not kw or x.strip(':') in GEN_COLS_OG or kw in x)]
+
+    if full_df is not None:
+        df = full_df[usecols]
+    elif cache_fp is None:
+        df = pd.read_csv(fp, header=1, encoding='latin', engine='pyarrow',
+                         usecols=usecols, dtype={FIPS_COL_OG: str})
+    else:
+        df = pd.read_parquet(cache_fp, columns=usecols)
+
+    return df
+
+
+def read_acs_counties(fp,
+                      kw=None,
+                      name=None,
+                      total=True,
+                      moe=False,
+                      geo=False,
+                      cache=True):
     """Reads American Community Survey county-level data.
 
     Tested with 2015 5-year estimate demographic data, but likely compatible
@@ -18,32 +102,113 @@ class ACSCountyReader():
     - ACS_15_5YR_B04006_with_ann.csv (PEOPLE REPORTING ANCESTRY)
     - ACS_15_5YR_B05006_with_ann.csv (PLACE OF BIRTH FOR THE FOREIGN-BORN
          POPULATION IN THE UNITED STATES)
+
+    Parameters
+    ----------
+    fp : str
+        Filepath to table
+    kw : str
+        Search term to filter out irrelevant sub-populations
+        e.g. For Israeli ancestry, kw would be 'Israeli'
+        If None, return all sub-population data.
+    name : str or True or default None
+        If provided, name used for relevant columns from kw
+        If True, use kw as name for those columns.
+        If None do not rename.
+    total : bool, default True
+        If True, include total column, with its MOE if included,
+        renamed as 'Tot' and 'Tot_Moe'
+    moe : bool, default False
+        If True, include margin of error data
+    geo : bool, default False
+        If True
+    cache : bool, default True
+        If True, a Parquet copy of a .csv table is written
+        beside it on first read, and read from thereafter.
+
+    Returns
+    -------
+    df : pandas.DataFrame
     """
 
-    # _OG indicates the column name in original table
-    # These are followed by new column name in the assignment
-    FIPS_COL_OG, FIPS_COL = 'Id2', 'FIPS'
-    GEO_COL_OG, GEO_COL = 'Geography', 'County'
+    df = _read_table(fp, cache, kw, total=total, moe=moe, geo=geo)
+
+    # Final names are worked out first, then columns are projected
+    # and assigned once. Only general and kw columns were read.
+    # Inconsistency across tables with total ending in ':'
+    gen_cols = dict(zip(GEN_COLS_OG, GEN_COLS))
+    names = [gen_cols.get(x.strip(':'), x.strip(':')) for x in df.columns]
+
+    if kw and name is not None:
+        kw_cols = [x for x in names if kw in x]
+
+        # use kw arg value as new col name
+        name = kw if name is True else name
+
+        # prevents multiple kw matches from having the
+        # same name, i.e. ambiguous, but also allowing
+        # for when kw not found in columns
+        if len(kw_cols) > 2:
+            raise ValueError('Renaming only supported when '
+                             'keyword present in only one variable')
+        new_kw_cols = {}
+        for kw_col in kw_cols:
+            if EST_PRE in kw_col:
+                new_kw_cols[kw_col] = name + EST_SUF
+            elif MOE_PRE in kw_col:
+                new_kw_cols[kw_col] = name + MOE_SUF
+
+        names = [new_kw_cols.get(x, x) for x in names]
+
+    # preserves original column order
+    kept = [i for i, x in enumerate(names)
+            if moe or not x.endswith(MOE_SUF)]
+    df = df.iloc[:, kept]
+    df.columns = [names[i] for i in kept]
+
+    # county counts and MOEs fit in 32 bits
+    int_cols = df.select_dtypes('integer').columns
+    df[int_cols] = df[int_cols].astype('int32')
+
+    # TODO: Add support for name inserted into in Total column
+    # Should also allow for population total to have column name
+    # Pop
+    # elif name:
+    #     def name_total(x):
+    #         if x==TOT_EST and EST_SUF:
+    #             ls = x.split(EST_SUF)
+    #             ls.insert(1)
+    #             x = ''.join(ls)
+    #         elif x==TOT_MOE and MOE_SUF:
+    #             ls = x.split(MOE_SUF)
+    #             ls.insert(1)
+    #             x = ''.join(ls)
+    #         return x
+    #
+    #     df = df.rename(columns=name_total)
+    if geo:
+        df = split_state(df, GEO_COL)
+        df.State = state_to_abbr(df.State).astype('category')
+
+    df[FIPS_COL] = code_to_str(df[FIPS_COL], 5)
+    df = df.set_index(FIPS_COL)
 
-    # column prefixes used by ACS»
-    EST_PRE, MOE_PRE = 'Estimate; ', 'Margin of Error; '
-    # suffix for renamed columns
-    EST_SUF, MOE_SUF = '', '_Moe'
+    return df
 
-    TOT_EST_OG, TOT_EST = EST_PRE + 'Total', 'Tot' + EST_SUF
-    TOT_MOE_OG, TOT_MOE = MOE_PRE + 'Total', 'Tot' + MOE_SUF
 
-    GEN_COLS_OG = [FIPS_COL_OG, GEO_COL_OG, TOT_EST_OG, TOT_MOE_OG]
-    GEN_COLS = [FIPS_COL, GEO_COL, TOT_EST, TOT_MOE]
+class ACSCountyReader():
+    """Reads American Community Survey county-level data.
 
-    TO_DROP = ['Id']  # never necessary
+    Kept for compatibility, see read_acs_counties.
+    """
 
-    def __init__(self, fp='./'):
+    def __init__(self, fp='./', cache=True):
         """
         Initaliatizes reader with filepath to table.
         """
 
         self.fp = fp
+        self.cache = cache
 
     def read_counties(self,
                       kw=None,
@@ -53,95 +218,10 @@ class ACSCountyReader():
                       geo=False):
         """Reads ACS county-level demographic data.
 
-        Parameters
-        ----------
-        kw : str
-            Search term to filter out irrelevant sub-populations
-            e.g. For Israeli ancestry, kw would be 'Israeli'
-            If None, return all sub-population data.
-        name : str or True or default None
-            If provided, name used for relevant columns from kw
-            If True, use kw as name for those columns.
-            If None do not rename.
-        total : bool, default True
-            If True, include total column, with its MOE if included,
-            renamed as 'Tot' and 'Tot_Moe'
-        moe : bool, default False
-            If True, include margin of error data
-        geo : bool, default False
-            If True
-
-        Returns
-        -------
-        df : pandas.DataFrame
+        See read_acs_counties for parameters.
         """
-
-        df = pd.read_csv(self.fp, skiprows=1, encoding='latin')
-        df = df.drop(self.TO_DROP, axis=1)
-
-        # inconsistency across tables with total ending in ':'
-        df = df.rename(columns=lambda x: x.strip(':'))
-
-        df = df.rename(columns=dict(zip(self.GEN_COLS_OG, self.GEN_COLS)))
-
-        if kw:
-            kw_cols = [x for x in df.columns if kw in x]
-
-            df = df.select(
-                lambda x: x in self.GEN_COLS or x in kw_cols, axis=1)
-
-            if name is not None:
-                # use kw arg value as new col name
-                name = kw if name is True else name
-
-                # prevents multiple kw matches from having the
-                # same name, i.e. ambiguous, but also allowing
-                # for when kw not found in columns
-                if len(kw_cols) > 2:
-                    raise ValueError('Renaming only supported when '
-                                     'keyword present in only one variable')
-                new_kw_cols = []
-                for kw_col in kw_cols:
-                    if self.EST_PRE in kw_col:
-                        new_kw_cols.append(name + self.EST_SUF)
-                    elif self.MOE_PRE in kw_col:
-                        new_kw_cols.append(name + self.MOE_SUF)
-                    else:
-                        new_kw_cols.append(kw_col)
-
-                df = df.rename(columns=dict(zip(kw_cols, new_kw_cols)))
-
-        if not moe:
-            df = df.select(lambda x: not x.endswith(self.MOE_SUF), axis=1)
-        if not total:
-            df = df.select(
-                lambda x: x not in [self.TOT_EST, self.TOT_MOE], axis=1)
-        # TODO: Add support for name inserted into in Total column
-        # Should also allow for population total to have column name
-        # Pop
-        # elif name:
-        #     def name_total(x):
-        #         if x==self.TOT_EST and self.EST_SUF:
-        #             ls = x.split(self.EST_SUF)
-        #             ls.insert(1)
-        #             x = ''.join(ls)
-        #         elif x==self.TOT_MOE and self.MOE_SUF:
-        #             ls = x.split(self.MOE_SUF)
-        #             ls.insert(1)
-        #             x = ''.join(ls)
-        #         return x
-        #
-        #     df = df.rename(columns=name_total)
-        if geo:
-            df = split_state(df, self.GEO_COL)
-            df.State = state_to_abbr(df.State)
-        else:
-            df = df.drop([self.GEO_COL], axis=1)
-
-        df[self.FIPS_COL] = code_to_str(df[self.FIPS_COL], 5)
-        df = df.set_index(self.FIPS_COL)
-
-        return df
+        return read_acs_counties(self.fp, kw, name, total, moe, geo,
+                                 cache=self.cache)
 
 
 # TODO: not working: dict(name='Pop', kw='Total', fp=)
@@ -156,16 +236,22 @@ def read_merge_acs(params, geo=False):
     >>> read_merge_acs(params)
 
     """
-    dfs = []
-    for tbl in params:
+    def read_tbl(tbl, geo):
         name, kw, fp = tbl['name'], tbl['kw'], tbl['fp']
 
-        dfs.append(
-            ACSCountyReader(fp)
-            .read_counties(kw=kw, name=name, total=False, geo=geo))
-        geo = False  # so only one set of geo columns
+        return read_acs_counties(fp, kw=kw, name=name, total=False, geo=geo)
+
+    # so only one set of geo columns
+    geos = [geo] + [False] * (len(params) - 1)
+
+    # tables are independent, parsing releases the GIL
+    with ThreadPoolExecutor(max_workers=len(params)) as executor:
+        dfs = list(executor.map(read_tbl, params, geos))
 
     df = pd.concat(dfs, axis=1, join='inner')
-    df = df[df.sum(1) > 0]
+
+    # counties with any count, counts are never negative
+    has_cnts = df.select_dtypes('number').to_numpy().any(axis=1)
+    df = df.loc[has_cnts]
 
     return df
@@ -1,6 +1,12 @@
+import re
+
 import pandas as pd
-from utilities import split_state, state_to_abbr, code_to_str
+from utilities import cached_read, split_state, state_to_abbr, code_to_str
+
+# whitespace padded comma, normalized in region names
+COMMA_SPACE_RE = re.compile(r'\s+,\s+')
 
+@cached_read
 def read_ajpp_geo(fp):
     """Reads AJPP Geography lookup table.
 
@@ -30,24 +36,30 @@ def read_ajpp_geo(fp):
     -------
     df : pandas.DataFrame
     """
-    df = (pd.read_excel(fp, parse_cols=[1, 2, 3], skiprows=2, skip_footer=4,
-                        names=['Region', 'County', 'FIPS'])
-          .fillna(method='ffill')
+    df = (pd.read_excel(fp, engine='openpyxl', sheet_name=0,
+                        usecols=[1, 2, 3], skiprows=2, skipfooter=4,
+                        names=['Region', 'County', 'FIPS'],
+                        dtype={'FIPS': str})
+          .ffill()
           )
     df.FIPS = code_to_str(df.FIPS, 5)
     df = df.set_index('FIPS')
 
     # df = df.apply(lambda x: x.str.strip())
-    df = split_state(df, 'County', 'State')
-
-    # for regions that span states
-    df = split_state(df, 'Region', suffix='States')
+    # Region_States for regions that span states
+    df = split_state(df, ['County', 'Region'], suffix=['State', 'States'])
 
     # fix typos
     df.Region = df.Region.str.replace(
         'Washington DC & Northwest Suburbs, MD',
-        'Washington DC & Northwest Suburbs, DC'
+        'Washington DC & Northwest Suburbs, DC',
+        regex=False
         )
+
+    # few unique states repeated across counties
+    state_cols = ['County_State', 'Region_States']
+    df[state_cols] = df[state_cols].astype('category')
+
     return df
 
 def read_ajpp_pop(fp, geo_fp):
@@ -85,19 +97,14 @@ def read_ajpp_pop(fp, geo_fp):
         """Creates state column for regions from header cols."""
 
         # state header rows have no other values
-        states = df[df.drop('Region', axis=1).isnull().all(1)].Region
-
-        n_states = len(states)
-        state_pos = states.index.tolist()
+        is_state = df.drop('Region', axis=1).isnull().all(1)
 
         # shift state header rows into Primary_State col and fill
         # for the resp. state's regions.
-        for cnt, (idx, state) in enumerate(states.iteritems(), 1):
-            start = idx
-            stop = state_pos[cnt] if cnt < n_states else None
-            df.loc[start:stop, 'Primary_State'] = state
+        df.loc[is_state, 'Primary_State'] = df.loc[is_state, 'Region']
+        df['Primary_State'] = df['Primary_State'].ffill()
 
-        df = df.drop(states.index)  # drop state header rows
+        df = df.loc[~is_state].copy()  # drop state header rows
         df['Primary_State'] = state_to_abbr(df['Primary_State'])
 
         return df
@@ -115,29 +122,35 @@ def read_ajpp_pop(fp, geo_fp):
         # for each region that spans states, indicated by superscript 3
         is_multistate = df.Region.str.endswith(u'\xb3')
         df.Region = df.Region.str.strip(u'\xb3')
-        for idx, region in df.loc[is_multistate, 'Region'].iteritems():
-            df.loc[idx, 'Region_States'] = (geo_df[geo_df.Region==region]
-                                            .ix[0, 'Region_States'])
+
+        region_states = (geo_df.drop_duplicates('Region')
+                         .set_index('Region')
+                         .loc[:, 'Region_States'])
+        df.loc[is_multistate, 'Region_States'] = (
+            df.loc[is_multistate, 'Region'].map(region_states))
 
         return df
 
     def clean_region(df):
         """Strips extra whitespace and annotation keys."""
 
-        df['Region'] = (df.Region.replace(r'\s+,\s+', ', ', regex=True)
+        df['Region'] = (df.Region.str.replace(COMMA_SPACE_RE, ', ',
+                                              regex=True)
                         .str.strip()
                         )
         return df
 
     def fix_typos(df):
-        df['Region'] = df.Region .str.replace(
+        df['Region'] = df.Region.str.replace(
             'Albuquerque, Sante Fe & Durango Regions',
-            'Albuquerque, Santa Fe & Durango Regions'
+            'Albuquerque, Santa Fe & Durango Regions',
+            regex=False
             )
         return df
 
     df = pd.read_excel(
-        fp, parse_cols=[0, 1, 6], skiprows=7, skip_footer=9,
+        fp, engine='openpyxl', sheet_name=0,
+        usecols=[0, 1, 6], skiprows=7, skipfooter=9,
         names=['Region', 'Total_Adults', 'Jewish_By_Rel']
         )
     df = (df.pipe(clean_region)
@@ -152,6 +165,7 @@ def read_ajpp_pop(fp, geo_fp):
     # reorder columns
     columns = ['Region_States', 'Region', 'Total_Adults', 'Jewish_By_Rel']
     df = df.reindex(columns=columns)
+    df['Region_States'] = df['Region_States'].astype('category')
 
     return df
 
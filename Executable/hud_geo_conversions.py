@@ -1,9 +1,11 @@
+import os
+
 import pandas as pd
 
-from utilities import code_to_str
+from utilities import cached_read, code_to_str, write_parquet_cache
 
 
-def read_zips_to_fips(fp, inverse=False):
+def read_zips_to_fips(fp, inverse=False, cache=True):
     """
     Read 2010 Census counties to USPS Zips crosswalk file,
     updated for Q4 2016.
@@ -38,6 +40,9 @@ def read_zips_to_fips(fp, inverse=False):
     inverse : bool, default is False
         If True, read county-to-zip table instead of default
         and set index to FIPS instead of ZIP
+    cache : bool, default is True
+        If True, a Parquet copy of the table is written beside it
+        on first read, and read from thereafter.
 
     Returns
     -------
@@ -51,11 +56,32 @@ def read_zips_to_fips(fp, inverse=False):
     if not inverse and fp.split('/')[-1] != 'ZIP_COUNTY_122016.xlsx':
         raise ValueError('Should load file: ZIP_COUNTY_122016.xlsx')
 
-    df = pd.read_excel(fp)
-    df = df.rename(columns={'COUNTY': 'FIPS'})
+    return _read_zips_to_fips(fp, inverse, cache)
+
+
+@cached_read
+def _read_zips_to_fips(fp, inverse, cache):
+    """Reads HUD crosswalk file, from its Parquet copy if current."""
+    cache_fp = os.path.splitext(fp)[0] + '.parquet' if cache else None
+
+    # cache is re-written if missing or older than the table
+    if (cache_fp is not None and os.path.exists(cache_fp) and
+            os.path.getmtime(cache_fp) >= os.path.getmtime(fp)):
+        df = pd.read_parquet(cache_fp)
+    else:
+        df = pd.read_excel(
+            fp, engine='openpyxl', sheet_name=0,
+            usecols=['ZIP', 'COUNTY', 'RES_RATIO', 'BUS_RATIO', 'OTH_RATIO',
+                     'TOT_RATIO'],
+            dtype={'ZIP': str, 'COUNTY': str}
+            )
+        df = df.rename(columns={'COUNTY': 'FIPS'})
+
+        df.ZIP = code_to_str(df.ZIP, 5)
+        df.FIPS = code_to_str(df.FIPS, 5)
 
-    df.ZIP = code_to_str(df.ZIP, 5)
-    df.FIPS = code_to_str(df.FIPS, 5)
+        if cache_fp is not None:
+            write_parquet_cache(df, cache_fp)
 
     df = df.set_index('FIPS') if inverse else df.set_index('ZIP')
 
@@ -1,7 +1,10 @@
+import json
 from collections import OrderedDict
 
 import pandas as pd
 
+READ_BUFFER_SIZE = 64 * 1024  # bytes
+
 
 class JData:
     """JData Jewish educational organization directory.
@@ -23,6 +26,16 @@ class JData:
         OrderedDict used so consistent output for get_miscats()
     TYPE_NAMES : dict
         Use to rename all type values, and for reference.
+    CAT_COLS : list
+        Columns of few repeated values, stored as categoricals.
+    MANUAL_IMPUTES : DataFrame
+        Missing location values by org name, NaN where none.
+    MANUAL_DROPS : list
+        Names of orgs without a locatable US address.
+    DENOM_SEARCH : OrderedDict
+        Lowercase denomination names to search for, except Other,
+        keyed by their renamed values. Ordered by full denomination
+        name, which sets get_denom_miscats() output order.
     """
     COL_NAMES = {
         'Address': 'Addr',
@@ -53,6 +66,44 @@ class JData:
         'Overnight camp': 'OverCamp',
         'Part-time school': 'PTSch'
     }
+    CAT_COLS = ['Type', 'Denom', 'State', 'Country']
+    MANUAL_IMPUTES = pd.DataFrame({
+        'City': {
+            'Camp Nageela East': 'Fallsburg',
+            'The Maui Hebrew Academy': 'Kahului',
+            'Am Shalom of Lake County Educational Program': 'Mentor',
+        },
+        'State': {
+            'Camp Nageela East': 'NY',
+            'Community Day School Early Childhood Education Program': 'PA',
+            'Am Shalom of Lake County Educational Program': 'OH',
+        },
+        'Zip': {
+            'Camp Darom (Baron Hirsch)': '35031',
+            'Camp Nageela East': '12733',
+            'Community Day School Early Childhood Education Program': '15217',
+            'The Maui Hebrew Academy': '96732',
+            'Am Shalom of Lake County Educational Program': '44060',
+        },
+        'Country': {
+            'Camp Darom (Baron Hirsch)': 'US',
+            'Camp Nageela East': 'US',
+            'Community Day School Early Childhood Education Program': 'US',
+            'The Maui Hebrew Academy': 'US',
+            'Am Shalom of Lake County Educational Program': 'US',
+        },
+    })
+    MANUAL_DROPS = [
+        'Ramah Israel Seminar',
+        'Temple Tifereth Israel Religious School',
+        'Average Chicago Conservative Part-Time School',
+        'Average Chicago Reform Part-Time School',
+    ]
+    DENOM_SEARCH = OrderedDict(
+        (denom, full_denom.lower())
+        for full_denom, denom in sorted(DENOM_NAMES.items())
+        if full_denom != 'Other'  # too broad to be useful
+    )
 
 
     def __init__(self):
@@ -80,16 +131,28 @@ class JData:
         self.clean = clean
         self.only_usa = only_usa
 
-        orgs_df = (pd.read_json(fp)
-                   .rename(columns=self.COL_NAMES)
-                   .reset_index(drop=True)
-        )
+        # Scraped file is one object of columns, each mapping row
+        # labels to values, so skip read_json dtype and date inference.
+        # json.load decodes the raw bytes itself.
+        with open(fp, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            orgs_df = (pd.DataFrame(json.load(f))
+                       .rename(columns=self.COL_NAMES)
+                       .reset_index(drop=True)
+            )
 
-        orgs_df = orgs_df.replace(
-            dict(Type=self.TYPE_NAMES, Denom=self.DENOM_NAMES)
-        )
         # reorder columns
         orgs_df = orgs_df.reindex(columns=self.ORDERED_COLS)
+        dtypes = dict.fromkeys(self.CAT_COLS, 'category')
+        dtypes['Zip'] = 'string[pyarrow]'  # contiguous, mostly unique
+        orgs_df = orgs_df.astype(dtypes)
+
+        # rename per category rather than per row, keeping them sorted
+        for col, names in [('Type', self.TYPE_NAMES),
+                           ('Denom', self.DENOM_NAMES)]:
+            cats = orgs_df[col].cat.rename_categories(
+                lambda cat: names.get(cat, cat))
+            orgs_df[col] = cats.cat.reorder_categories(
+                sorted(cats.cat.categories))
 
         if clean:
             orgs_df = self.clean_orgs(orgs_df)
@@ -101,10 +164,21 @@ class JData:
 
     def clean_orgs(self, orgs_df):
         """Clean, fix and filter out Canadian orgs."""
-        orgs_df = (orgs_df.pipe(self.manual_imputes)
-              .pipe(self.impute_denoms_with_miscats)
-              .pipe(self.correct_seph_miscats)
-        )
+        orgs_df = self.manual_imputes(orgs_df)
+
+        # Imputing only fills missing or Other denoms, so the same
+        # miscategorized orgs can be used to correct Sephardic ones,
+        # with both written in one assignment. Sephardic comes last
+        # so it overrides imputes, as when correcting after imputing.
+        miscats_dict = self.get_denom_miscats(orgs_df)
+        denom_fixes = pd.concat([
+            self._denom_imputes(miscats_dict),
+            pd.Series('Seph', index=miscats_dict['Seph'].index)
+        ])
+        orgs_df = self._set_denoms(orgs_df, denom_fixes)
+
+        # Categorical columns factorize from their codes, which beats
+        # both hashing whole rows and sorting to compare neighbours.
         orgs_df = orgs_df.drop_duplicates(
                     ['Addr', 'City', 'State', 'Zip', 'Type', 'Denom']
         )
@@ -117,16 +191,18 @@ class JData:
     @staticmethod
     def combine_similar_denoms(orgs_df):
         """Combine denomination categories for JData orgs."""
-        # noisy, so few
-        orgs_df.Denom = orgs_df.Denom.replace('Seph', 'Orth')
-
-        # Traditional more often Orthodox than conservative
-        # http://www.jewfaq.org/movement.htm
-        orgs_df.Denom = orgs_df.Denom.replace('Trad', 'Orth')
-
-        # Similar with very few entries
-        orgs_df.Denom = orgs_df.Denom.replace('Hum', 'Sec')
-
+        similar = {
+            # noisy, so few
+            'Seph': 'Orth',
+            # Traditional more often Orthodox than conservative
+            # http://www.jewfaq.org/movement.htm
+            'Trad': 'Orth',
+            # Similar with very few entries
+            'Hum': 'Sec',
+        }
+        orgs_df.Denom = (orgs_df.Denom.replace(similar)
+                         .cat.remove_unused_categories()
+        )
         return orgs_df
 
     @staticmethod
@@ -134,31 +210,62 @@ class JData:
         """Combine non-denominational orgs together."""
 
         non_denoms = ['Comm', 'PlurTrans', 'Hum', 'Sec']
-        orgs_df.Denom = orgs_df.Denom.replace(non_denoms, 'NonDenom')
+        denoms = orgs_df.Denom
+        if isinstance(denoms.dtype, pd.CategoricalDtype):
+            if 'NonDenom' not in denoms.cat.categories:
+                denoms = denoms.cat.add_categories('NonDenom')
+            denoms = (denoms.replace(non_denoms, 'NonDenom')
+                      .cat.remove_unused_categories()
+            )
+        else:
+            denoms = denoms.replace(non_denoms, 'NonDenom')
+        orgs_df.Denom = denoms
 
         return orgs_df
 
     @classmethod
-    def impute_denoms_with_miscats(cls, orgs_df):
+    def impute_denoms_with_miscats(cls, orgs_df, miscats_dict=None):
         """Impute missing denoms using clues from other features.
 
         This does not impute all missing denominations. Best left to
         other superclass JDataCounty that can proportionally distribute
         nans across other denoms in county.
+
+        miscats_dict from get_denom_miscats() is computed if not passed.
         """
-        miscats_dict = cls.get_denom_miscats(orgs_df)
+        if miscats_dict is None:
+            miscats_dict = cls.get_denom_miscats(orgs_df)
+
+        return cls._set_denoms(orgs_df, cls._denom_imputes(miscats_dict))
 
-        for type_, data in miscats_dict.items():
-            missing = data[data.Denom.isnull() | (data.Denom == 'Oth')].index
-            orgs_df.loc[missing, 'Denom'] = type_
+    @staticmethod
+    def _denom_imputes(miscats_dict):
+        """Return Series of denoms to impute, indexed by org label."""
+        return pd.concat([
+            pd.Series(type_, index=data.index[
+                data.Denom.isnull() | (data.Denom == 'Oth')])
+            for type_, data in miscats_dict.items()
+        ])
+
+    @staticmethod
+    def _set_denoms(orgs_df, denoms):
+        """Assign Series of denoms by org label in one scatter.
 
+        Where a label repeats, its last value wins, as when assigned
+        one at a time.
+        """
+        denoms = denoms[~denoms.index.duplicated(keep='last')]
+        orgs_df.loc[denoms.index, 'Denom'] = denoms.to_numpy()
         return orgs_df
 
     @classmethod
-    def correct_seph_miscats(cls, orgs_df):
-        """Correct any orgs with Sephardic in Name or URL."""
+    def correct_seph_miscats(cls, orgs_df, miscats_dict=None):
+        """Correct any orgs with Sephardic in Name or URL.
 
-        miscats_dict = cls.get_denom_miscats(orgs_df)
+        miscats_dict from get_denom_miscats() is computed if not passed.
+        """
+        if miscats_dict is None:
+            miscats_dict = cls.get_denom_miscats(orgs_df)
 
         orgs_df.loc[miscats_dict['Seph'].index, 'Denom'] = 'Seph'
         return orgs_df
@@ -186,25 +293,27 @@ class JData:
             print(
                 '{:<23}{:<23}\n'.format('FOUND ELSEWHERE', 'ACTUAL CATEGORY'))
 
-        miscats_dict = {}
-        for full_denom, denom in sorted(cls.DENOM_NAMES.items()):
-            if full_denom == 'Other':
-                continue  # too broad to be useful
+        # Lowercase Name and URL once, as one text per org. No
+        # denomination contains a newline, so none can span both.
+        text = (orgs_df.Name.fillna('') + '\n' + orgs_df.URL.fillna('')
+                ).str.lower()
+        denoms = orgs_df.Denom.to_numpy()
 
-            contains_cat = orgs_df[['Name', 'URL']].apply(
-                lambda x: x.str.contains(full_denom, case=False)
-            )
-            miscats_subset = orgs_df.loc[
-                contains_cat.any(1) & (orgs_df.Denom != denom)
-                ]
+        miscats_dict = {}
+        for denom, full_denom in cls.DENOM_SEARCH.items():
+            # literal substring search, no regex engine needed
+            mentions = text.str.contains(full_denom, regex=False).to_numpy()
+            miscats_subset = orgs_df.loc[mentions & (denoms != denom)]
             miscats_dict[denom] = miscats_subset
             if pretty_print:
                 # total of found categories
                 print('{:>3} {:<23}'.format(len(miscats_subset), denom))
                 # list of actual categories for that found one
-                for bad_cat, rows in (miscats_subset.fillna('nan')
-                                      .groupby('Denom')):
-                    print('{}{:>3} {}'.format(' ' * 23, len(rows), bad_cat))
+                bad_cat_cnts = (miscats_subset.Denom.astype(object)
+                                .fillna('nan').value_counts().sort_index()
+                )
+                for bad_cat, cnt in bad_cat_cnts.items():
+                    print('{}{:>3} {}'.format(' ' * 23, cnt, bad_cat))
         return miscats_dict
 
     @staticmethod
@@ -217,18 +326,23 @@ class JData:
         try:
             orgs_df.loc[orgs_df.State.isin(['QC', 'ON']), 'Country'] = 'CA'
 
-            orgs_df.loc[260, ['Zip', 'Country']] = (
-                '35031', 'US')
-            orgs_df.loc[347, ['City', 'State', 'Zip', 'Country']] = (
-                'Fallsburg', 'NY', '12733', 'Country')
-            orgs_df.loc[696, ['State', 'Zip', 'Country']] = (
-                'PA', '15217', 'US')
-            orgs_df.loc[860, ['City', 'Zip', 'Country']] = (
-                'Kahului', '96732', 'US')
-            orgs_df.loc[1418, ['City', 'State', 'Zip', 'Country']] = (
-                'Mentor', 'OH', '44060', 'US')
-
-            orgs_df = orgs_df.drop([386, 2084, 2142, 2143])
+            # keyed by name, since row order depends on the scrape
+            imputes = (JData.MANUAL_IMPUTES.reindex(orgs_df.Name)
+                       .set_axis(orgs_df.index, axis=0))
+
+            # One pass per column. DataFrame.update would turn the
+            # categorical columns to object on older pandas.
+            for col, values in imputes.items():
+                col_ser = orgs_df[col]
+                # categoricals only accept values already in categories
+                if isinstance(col_ser.dtype, pd.CategoricalDtype):
+                    new_cats = (set(values.dropna())
+                                - set(col_ser.cat.categories))
+                    if new_cats:
+                        col_ser = col_ser.cat.add_categories(sorted(new_cats))
+                orgs_df[col] = col_ser.where(values.isna(), values)
+
+            orgs_df = orgs_df.loc[~orgs_df.Name.isin(JData.MANUAL_DROPS)]
         except ValueError as e:
             raise ValueError(
                 str(e) + ': ' + 'Must be before dropping Canadian orgs.')
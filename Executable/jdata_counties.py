@@ -1,3 +1,4 @@
+import itertools
 import math
 import re
 
@@ -22,6 +23,26 @@ TYPE_COLS  = ['Type_DaySch', 'Type_PTSch', 'Type_EarlyChild', 'Type_DayCamp',
 DATA_DIR    = '../Data/'
 FIPS_CODES_FP = ''.join([DATA_DIR, 'Census-2010-County-FIPS.txt'])
 
+NON_WORD_RE = re.compile(r'\W')  # invalid in column attribute names
+
+CNTY_CNTS_CACHE_SIZE = 4  # most recent aggregations kept per instance
+
+
+def _isin_cats(cat_ser, values):
+    """Return boolean array of whether categorical values are in
+    values, comparing integer codes rather than strings.
+    """
+    codes = cat_ser.cat.categories.get_indexer(values)
+    # -1 marks values not in categories, and missing values in codes
+    return np.isin(cat_ser.cat.codes.to_numpy(), codes[codes >= 0])
+
+
+def _filter_key(values):
+    """Return hashable, order-free form of include/exclude values."""
+    if values is None:
+        return None
+    return frozenset([values] if isinstance(values, str) else values)
+
 
 class JDataCounties(JData):
     """Counts of JData orgs for US counties by type and denomination."""
@@ -49,6 +70,28 @@ class JDataCounties(JData):
         self.jdata_org_fp = jdata_org_fp
 
         self.to_fips = read_zips_to_fips(zips_to_fips_fp)
+        # Conversion table is fixed, so zip lookups are prepared once.
+        self._hud_zips = frozenset(self.to_fips.index)
+        self._hud_fips = frozenset(self.to_fips.FIPS)
+        self._hud_zip_arr = np.unique(self.to_fips.index.astype(int).values)
+
+        # Weight and county code of each zip-county pair in the table,
+        # so aggregation only has to gather the rows of counted zips.
+        # If no other ratio (non-residential, non-business), zip counts
+        # are split evenly across counties, otherwise counts would be
+        # zero'd out.
+        ratios = self.to_fips.OTH_RATIO
+        # transform keeps table order, so zips need not be sorted
+        zip_grps = ratios.groupby(level=0, sort=False)
+        ratio_sums = zip_grps.transform('sum').to_numpy()
+        has_ratios = np.isclose(ratio_sums, 1)
+        self._valid_ratios = has_ratios | (ratio_sums == 0)
+        imputed_ratios = 1 / zip_grps.transform('size')
+        # fractional counts in the thousands need no more than float32
+        self._fips_weights = np.where(
+            has_ratios, ratios, imputed_ratios).astype(np.float32)
+        self._fips_codes, self._fips = pd.factorize(
+            self.to_fips.FIPS, sort=True)
 
         # Intermediate steps.
         # If client makes changes to self.orgs_df, those are preserved
@@ -61,6 +104,10 @@ class JDataCounties(JData):
         # Used for testing.
         self._orgs_df = None
 
+        # Recent county counts before filter_categorical, keyed on orgs
+        # content and include/exclude filters, least recently used first.
+        self._cnty_cnts_cache = {}
+
         self.cnty_df = None
 
         self.include = None
@@ -89,7 +136,8 @@ class JDataCounties(JData):
                 raise ValueError('Values to be excluded must be in data.')
 
             orgs_df = orgs_df.loc[
-                ~orgs_df[['Type', 'Denom']].isin(exclude).any(1)
+                ~(_isin_cats(orgs_df.Type, exclude)
+                  | _isin_cats(orgs_df.Denom, exclude))
             ]
         # Including has a more complicated logic. If only Denoms
         # are specified, it is assumed all Types are included, and
@@ -102,27 +150,22 @@ class JDataCounties(JData):
 
             include_type = any(x in valid_types for x in include)
             include_denom = any(x in valid_denoms for x in include)
+            type_mask = _isin_cats(orgs_df.Type, include)
+            denom_mask = _isin_cats(orgs_df.Denom, include)
             if include_type and include_denom:
-                orgs_df = orgs_df.loc[
-                    orgs_df[['Type', 'Denom']].isin(include).all(1)
-                ]
+                orgs_df = orgs_df.loc[type_mask & denom_mask]
             elif include_type or include_denom:
-                orgs_df = orgs_df.loc[
-                    orgs_df[['Type', 'Denom']].isin(include).any(1)
-                ]
+                orgs_df = orgs_df.loc[type_mask | denom_mask]
         return orgs_df
 
     @staticmethod
     def filter_categorical(cnty_df, categorical):
         """Drop categorical columns if necessary."""
-        if categorical == 'denom':
-            cnty_df = cnty_df.select(
-                lambda x: x.startswith('Denom_'), axis=1
-            )
-        elif categorical == 'type':
-            cnty_df = cnty_df.select(
-                lambda x: x.startswith('Type_'), axis=1
-            )
+        prefixes = {'denom': 'Denom_', 'type': 'Type_'}
+        if categorical in prefixes:
+            cnty_df = cnty_df.loc[
+                :, cnty_df.columns.str.startswith(prefixes[categorical])
+            ]
         elif categorical != 'both':
             raise ValueError(
                 'categorical arg must be either both, denom or type.')
@@ -170,31 +213,47 @@ class JDataCounties(JData):
             # get_county_cnts(). Only American orgs are supported.
             self.orgs_df = self.read_orgs(self.jdata_org_fp)
 
-        # Method may modify orgs for count calculation, but
-        # self.orgs_df state will be maintained.
-        self._orgs_df = self.orgs_df.copy()
-
         if include is not None and exclude is not None:
             raise ValueError('Cannot pass both include and exclude kwargs.')
 
-        elif include is not None or exclude is not None:
-            self._orgs_df = self._filter_incl_excl(self._orgs_df, include, exclude)
-            
-        self._zip_cnts_df = self._orgs_to_zip_cnts(self._orgs_df)
-        self.cnty_df = (self._zip_cnts_to_fips(self._zip_cnts_df)
-                        .pipe(self._impute_denoms_county_cnts))
-
-        self.cnty_df = self.filter_categorical(self.cnty_df, categorical)
+        # Aggregation only depends on orgs and filters, so it is reused
+        # across calls that change categorical alone. Orgs are keyed by
+        # content since the client may change them in place.
+        orgs_hash = int(
+            pd.util.hash_pandas_object(self.orgs_df, index=False).sum())
+        key = (orgs_hash, _filter_key(include), _filter_key(exclude))
+        cache = self._cnty_cnts_cache
+        if key in cache:
+            cache[key] = cache.pop(key)  # now most recently used
+        else:
+            # Method may modify orgs for count calculation, but
+            # self.orgs_df state will be maintained.
+            orgs_df = self.orgs_df.copy()
+            if include is not None or exclude is not None:
+                orgs_df = self._filter_incl_excl(orgs_df, include, exclude)
+
+            zip_cnts_df = self._orgs_to_zip_cnts(orgs_df)
+            cnty_df = (self._zip_cnts_to_fips(zip_cnts_df)
+                       .pipe(self._impute_denoms_county_cnts))
+            cache[key] = orgs_df, zip_cnts_df, cnty_df
+            if len(cache) > CNTY_CNTS_CACHE_SIZE:
+                del cache[next(iter(cache))]
+
+        # copies, so changes by client do not leak into the cache
+        self._orgs_df, self._zip_cnts_df, cnty_df = (
+            df.copy() for df in cache[key])
+        self.cnty_df = self.filter_categorical(cnty_df, categorical)
 
         # Validate FIPS index
-        if not self.cnty_df.index.isin(self.to_fips.FIPS).all():
+        if not self._hud_fips.issuperset(self.cnty_df.index):
             raise ValueError('County FIPS codes index not valid')
 
         # Validate total organizations counted
-        norm = 2 if categorical is 'both' else 1  # if orgs counted twice
-        total_cnts = self.cnty_df.values.sum() / norm
+        norm = 2 if categorical == 'both' else 1  # if orgs counted twice
+        # one pass over a contiguous float array, never object dtype
+        total_cnts = self.cnty_df.to_numpy(dtype=np.float64).sum() / norm
         source_ref = len(self._orgs_df)
-        if not math.isclose(total_cnts, source_ref):
+        if not math.isclose(total_cnts, source_ref, rel_tol=1e-5):  # float32
             raise ValueError(
                 '{} total county counts does not match {} JData orgs'
                 .format(total_cnts, source_ref))
@@ -224,55 +283,67 @@ class JDataCounties(JData):
             Each row indexed to a unique zip code with count
             aggregates for organizations that belong to it.
         """
-        # Less than 10 valid zips not present in conversion table
-        if orgs_df.Zip.isin(self.to_fips.index).sum() < 10:
+        # Less than 10 valid zips not present in conversion table,
+        # stopping once 10 are found
+        valid_zips = (zip_ for zip_ in orgs_df.Zip if zip_ in self._hud_zips)
+        if len(list(itertools.islice(valid_zips, 10))) < 10:
             raise ValueError('Zip codes are not valid.')
 
-        orgs_dum = pd.get_dummies(orgs_df[['Type', 'Denom']], dummy_na=True)
-        zip_cnts_df = orgs_dum.groupby(orgs_df.Zip).sum()
-        zip_cnts_df = zip_cnts_df.rename(
-            columns=lambda x: re.sub(r'\W', '_', x)
+        # Count orgs by zip and category straight from codes, dropping
+        # orgs with no zip. Zips are re-sorted when merged with imputed
+        # ones.
+        zip_codes, zips = pd.factorize(orgs_df.Zip)
+        has_zip = zip_codes >= 0
+
+        col_names, col_pos = [], []
+        for col in ['Type', 'Denom']:
+            # categories filtered out would otherwise become empty columns
+            cats = orgs_df[col].cat.remove_unused_categories()
+            codes = cats.cat.codes.to_numpy()
+            n_cats = len(cats.cat.categories)
+            # missing values get their own last column, like dummy_na
+            col_pos.append(len(col_names) + np.where(codes < 0, n_cats, codes))
+            col_names += ['{}_{}'.format(col, cat)
+                          for cat in cats.cat.categories] + [col + '_nan']
+
+        cnts = np.zeros((len(zips), len(col_names)), dtype=np.int32)
+        for pos in col_pos:
+            np.add.at(cnts, (zip_codes[has_zip], pos[has_zip]), 1)
+
+        zip_cnts_df = pd.DataFrame(
+            cnts, index=pd.Index(zips, name='Zip'),
+            columns=[NON_WORD_RE.sub('_', col) for col in col_names]
         )
         return zip_cnts_df
 
     def _zip_cnts_to_fips(self, zip_cnts_df):
         """Aggregate org counts by zip to counts by county."""
-        zip_cnts_df = self._missing_zip_to_nearest(zip_cnts_df, self.to_fips)
-
-        to_fips_revelent = self.to_fips.loc[self.to_fips.index.isin(
-            zip_cnts_df.index)]
-        gb = to_fips_revelent.groupby(to_fips_revelent.index)
-
-        # for each zip and its corresponding fips codes
-        ls = []
-        for zip_, fips_grp in gb:
-            # if no other ratio (non-residential, non-business),
-            # split zip counts evenly across counties, otherwise counts
-            # would be zero'd out
-            if np.isclose(fips_grp.OTH_RATIO.sum(), 1):
-                needs_imputed = False
-            elif fips_grp.OTH_RATIO.sum() == 0:
-                needs_imputed = True
-                imputed_ratio = 1 / len(fips_grp)
-            else:
-                raise ValueError('Ratios must total 1 to keep all orgs.')
-
-            # iterate through each county group with the zips that
-            # comprise it, taking counts of each zip and weighting
-            # them by the fraction that they exist in the county
-            for zip_idx, row in fips_grp.iterrows():
-                # Use imputed ratio if necessary
-                weight = imputed_ratio if needs_imputed else row.OTH_RATIO
-
-                new = zip_cnts_df.loc[zip_] * weight
-                new.loc['FIPS'] = row.FIPS
-                ls.append(new)
-
-        cnty_df = pd.concat(ls, axis=1).T
-        return cnty_df.groupby(cnty_df.FIPS).sum()
-
-    @staticmethod
-    def _missing_zip_to_nearest(zip_cnts_df, to_fips, msg=False):
+        zip_cnts_df = self._missing_zip_to_nearest(zip_cnts_df)
+
+        # row position of each table zip in zip counts, if there
+        zip_pos = zip_cnts_df.index.get_indexer(self.to_fips.index)
+        is_relevant = zip_pos >= 0
+        zip_pos = zip_pos[is_relevant]
+
+        if not self._valid_ratios[is_relevant].all():
+            raise ValueError('Ratios must total 1 to keep all orgs.')
+        weights = self._fips_weights[is_relevant]
+
+        # counts of each zip weighted by the fraction of it in each
+        # of its counties, one row per zip-county pair, scatter-added
+        # into their counties
+        cnts = (zip_cnts_df.to_numpy(dtype=np.float32)[zip_pos]
+                * weights[:, np.newaxis])
+        used_fips, fips_codes = np.unique(
+            self._fips_codes[is_relevant], return_inverse=True)
+        cnty_cnts = np.zeros((len(used_fips), cnts.shape[1]),
+                             dtype=np.float32)
+        np.add.at(cnty_cnts, fips_codes, cnts)
+
+        return pd.DataFrame(cnty_cnts, columns=zip_cnts_df.columns,
+                            index=pd.Index(self._fips[used_fips], name='FIPS'))
+
+    def _missing_zip_to_nearest(self, zip_cnts_df, msg=False):
         """
         Replace zip codes in df that are not present in
         zip-to-county conversion table. Replacements are rough
@@ -281,22 +352,30 @@ class JDataCounties(JData):
         Parameters
         ----------
         zip_cnts_df : pandas.DataFrame, must be indexed by zip code
-        to_fips : pandas.DataFrame, must have index of ZIPS,
-                  many-to-many zip-county conversion table
         msg : bool, if true, print old and new zips for analysis
 
         Returns
         ----------
         df : pandas.DataFrame, zip_cnts with missing zips fixed
         """
-        missing = set(zip_cnts_df.index) - set(to_fips.index)
-        zip_arr = to_fips.index.astype(int).values
-        zip_ests = {}
-        for zip_ in missing:
-            idx = np.abs(zip_arr - int(zip_)).argmin()
-            zip_est = str(zip_arr[idx]).zfill(5)
-            zip_ests[zip_] = zip_est
-
+        missing = sorted(set(zip_cnts_df.index) - self._hud_zips)
+        if not missing:
+            # nothing to impute or merge, all zips are in the table
+            return zip_cnts_df.sort_index()
+
+        zip_arr = self._hud_zip_arr  # sorted, unique
+        missing_arr = np.array([int(zip_) for zip_ in missing], dtype=int)
+
+        # binary search for the neighbours either side of each missing
+        # zip, taking the lower on a tie like argmin of distances would
+        upper = np.searchsorted(zip_arr, missing_arr).clip(1, len(zip_arr) - 1)
+        lower = upper - 1
+        nearest = np.where(
+            missing_arr - zip_arr[lower] <= zip_arr[upper] - missing_arr,
+            zip_arr[lower], zip_arr[upper]
+        )
+        zip_ests = {zip_: str(zip_est).zfill(5)
+                    for zip_, zip_est in zip(missing, nearest)}
 
         if msg:
             print('Zips not in HUD conversion table:')
@@ -304,11 +383,22 @@ class JDataCounties(JData):
             print('replaced with')
             print(list(zip_ests.values()))
 
-        # merge imputed zips with existing zip counts
-        zip_cnts_df = zip_cnts_df.rename(index=zip_ests)
-        zip_cnts_df = zip_cnts_df.groupby(zip_cnts_df.index).sum()
+        # merge imputed zips with existing zip counts, summing rows
+        # that now share a zip with one scatter-add
+        codes, zips = pd.factorize(
+            np.array([zip_ests.get(zip_, zip_) for zip_ in zip_cnts_df.index],
+                     dtype=object),
+            sort=True
+        )
+        cnts = zip_cnts_df.to_numpy()
+        merged = np.zeros((len(zips), cnts.shape[1]), dtype=cnts.dtype)
+        np.add.at(merged, codes, cnts)
+        zip_cnts_df = pd.DataFrame(
+            merged, columns=zip_cnts_df.columns,
+            index=pd.Index(zips, name=zip_cnts_df.index.name)
+        )
 
-        assert zip_cnts_df.index.isin(to_fips.index).all(), (
+        assert self._hud_zips.issuperset(zip_cnts_df.index), (
             'JData zips still missing from conversion table')
         return zip_cnts_df
 
@@ -329,22 +419,6 @@ class JDataCounties(JData):
             With only denomination count features
         """
 
-        def weighted_dist(row, none_col):
-            """
-            Distributes counts of orgs with missing denoms across
-            other denom counts in county accoring to proportion.
-            """
-            none_cnt = row[none_col]
-
-            total = sum(row) - none_cnt
-            if not total:
-                row += none_cnt / (len(row) - 1)
-            else:
-                weights = row / total
-                row += weights * none_cnt
-
-            return row
-
         denom_cols = [col for col in df.columns if col.startswith('Denom_')]
         if not len(denom_cols):
             raise ValueError('No denomination columns found')
@@ -356,9 +430,19 @@ class JDataCounties(JData):
         elif len(none_col) == 1:
             none_col = none_col[0]
 
-            df.loc[df[none_col] > 0, denom_cols] = (
-                df.loc[df[none_col] > 0, denom_cols].apply(
-                    weighted_dist, args=(none_col, ), axis=1))
+            # Distribute counts of orgs with missing denoms across
+            # other denom counts in county according to proportion,
+            # or evenly if the county has no other denom counts.
+            has_none = (df[none_col] > 0).to_numpy()
+            cnts = df.loc[has_none, denom_cols].to_numpy(dtype=np.float32)
+            none_cnts = df.loc[has_none, none_col].to_numpy(dtype=np.float32)
+            none_cnts = none_cnts[:, np.newaxis]
+            totals = cnts.sum(axis=1, keepdims=True) - none_cnts
+            with np.errstate(divide='ignore', invalid='ignore'):
+                weights = np.where(totals == 0,
+                                   np.float32(1 / (cnts.shape[1] - 1)),
+                                   cnts / totals)
+            df.loc[has_none, denom_cols] = cnts + weights * none_cnts
             df = df.drop(none_col, axis=1)
 
             # drop counties that have no other Denom data than None
@@ -1,11 +1,21 @@
 
 
+import numpy as np
 from lxml import etree
 import seaborn as sns
 
+from utilities import cached_read
+
 IMG_DIR = '../Images/'  # empty string if in same directory
 MAP_TEMPLATE_FP = ''.join([IMG_DIR, 'counties_map_template.svg'])
 
+
+@cached_read
+def _read_template(fp):
+    """Parses SVG template."""
+    return etree.parse(fp)
+
+
 # TODO: make class, add functionality for FIPS highlight without any other data
 def draw_county_data_svg(data, fp, colors=6, bins=None,
                          template=MAP_TEMPLATE_FP,
@@ -73,24 +83,26 @@ def draw_county_data_svg(data, fp, colors=6, bins=None,
         '{} colors passed for {} bins, must be equal.'.format(n_colors, n_bins)
         )
 
-    svg = etree.ElementTree(file=template)
+    # Style of each county with data, binned to the first bin its
+    # value does not exceed, values above all bins take the last
+    valid = data.dropna()
+    bin_idx = np.searchsorted(bins, valid.to_numpy(), side='left')
+    bin_idx = bin_idx.clip(max=n_bins - 1)
+    color_styles = [''.join([county_style, color]) for color in colors]
+    id_to_style = {id_: color_styles[i]
+                   for id_, i in zip(valid.index, bin_idx)}
+
+    svg = _read_template(template)
     for p in svg.iterfind('.//{http://www.w3.org/2000/svg}path'):
         id_ = p.attrib['id']
-        try:
-            val = data.at[id_]
-        except KeyError:
+        style = id_to_style.get(id_)
+        if style is None:
             if id_=='state_lines':
                 style = state_style
             elif id_=='separator':
                 style = sep_style
             else:  # if path is for a county not present in dataset
                 style = ''.join([county_style, no_data_color])
-        else:
-            # print(id_, val)
-            for bin_, color in zip(bins, colors):
-                if val <= bin_:
-                    style = ''.join([county_style, color])
-                    break
         p.attrib['style'] = style
 
     if make_key:
@@ -1,7 +1,8 @@
 # coding=<utf-8>
 
 from collections import OrderedDict
-import numpy as np
+import re
+
 import pandas as pd
 from utilities import state_to_abbr
 
@@ -85,6 +86,11 @@ PSS_TABLE_COLS = OrderedDict([
         'Multi_Pc')
     ])
 
+# Numbers exported as Excel formulas, e.g. ="12"
+QUOTED_NUM_RE = re.compile(r'="(\d+([.]\d+)?)"')
+# Annotation keys for missing or inapplicable values
+ANNOTATIONS = ['†', '‡', '–']
+
 def read_pss_table(fp, columns=PSS_TABLE_COLS):
     """Reads 2012-11 Private School Survey retrieved from
     online table generator.
@@ -108,34 +114,38 @@ def read_pss_table(fp, columns=PSS_TABLE_COLS):
         footer : str
     """
     def clean_text(df):
-        """Strips extra whitespace and annotation keys."""
-
-        df = (df.replace(r'="(\d+([.]\d+)?)"', r'\1', regex=True)
-              .replace(r'[†‡–]', np.nan, regex=True)  # for float conversion
-              )
+        """Strips formula quotes from numbers."""
+        # only a few columns have any, the rest are left alone
+        quoted = [col for col in df.columns
+                  if df[col].str.contains('="', regex=False, na=False).any()]
+        df[quoted] = df[quoted].apply(
+            lambda x: x.str.replace(QUOTED_NUM_RE, r'\1', regex=True))
         return df
 
     n_header_rows, n_footer_rows = 5, 4
     with open(fp) as f:
         header = '\n'.join(next(f).strip() for _ in range(n_header_rows))
 
-    df = pd.read_csv(fp, skiprows=n_header_rows, dtype=str)
+    # annotation keys are read as missing, for float conversion
+    df = pd.read_csv(fp, skiprows=n_header_rows, dtype=str,
+                     na_values=ANNOTATIONS)
 
-    footer = '\n'.join(
-        line.strip() for _, line in df.iloc[-n_footer_rows:, 0].iteritems()
-        )
+    footer = '\n'.join(df.iloc[-n_footer_rows:, 0].str.strip())
     df = df.iloc[:-(n_footer_rows+1), :]  # drops totals row too
 
-    df = (df.rename(columns=columns)
-          .apply(lambda x: x.str.strip())
+    df = df.rename(columns=columns)
+    float_cols = (
+        ['Days', 'Hours'] + df.loc[:, 'Total_Students':].columns.tolist()
+        )
+    # only text needs whitespace stripped, numbers are cast to float
+    str_cols = [col for col in df.columns if col not in float_cols]
+
+    df = (df.assign(**{col: df[col].str.strip() for col in str_cols})
           .pipe(clean_text)
           .set_index('ID')
           )
     df['State'] = state_to_abbr(df.loc[:, 'State'])
 
-    float_cols = (
-        ['Days', 'Hours'] + df.loc[:, 'Total_Students':].columns.tolist()
-        )
     df[float_cols] = df[float_cols].astype(float)
 
     return df, header, footer
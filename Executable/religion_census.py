@@ -1,13 +1,13 @@
 import re
-from collections import OrderedDict
 
 import pandas as pd
 
 from utilities import code_to_str
 
 """
-STANDARD_COLS, JUDHAISM_COLS : OrderedDict, list or None
-    OrderedDict used to filter then rename and order fields.
+STANDARD_COLS, JUDHAISM_COLS : dict, list or None
+    Dict used to filter then rename and order fields, in the
+    order they are listed.
     List to leave field names as is. None returns original fields.
     Standard fields are metadata (County names, etc.) and aggregate
     data (totals).
@@ -15,45 +15,55 @@ STANDARD_COLS, JUDHAISM_COLS : OrderedDict, list or None
     This distinction allows removing counties that do not have
 """
 
-STANDARD_COLS = OrderedDict([
-    ('STABBR', 'State'),
-    ('CNTYNAME', 'County'),
-    ('TOTCNG', 'Tot_Cngs'),
-    ('TOTADH', 'Tot_No'),
-    ('TOTRATE', 'Tot_Ra')
-])
+STANDARD_COLS = {
+    'STABBR': 'State',
+    'CNTYNAME': 'County',
+    'TOTCNG': 'Tot_Cngs',
+    'TOTADH': 'Tot_No',
+    'TOTRATE': 'Tot_Ra'
+}
 
 # Reorder from most conservative to least (or thereabouts),
 # for the sake of consistency across datasets
-JUDHAISM_COLS = OrderedDict([
-    ('OJUDCNG', 'OrthJud_Cngs'),
-    ('OJUDADH', 'OrthJud_No'),
-    ('OJUDRATE', 'OrthJud_Ra'),
-    ('CJUDCNG', 'ConsvJud_Cngs'),
-    ('CJUDADH', 'ConsvJud_No'),
-    ('CJUDRATE', 'ConsvJud_Ra'),
-    ('RFRMCNG', 'RefJud_Cngs'),
-    ('RFRMADH', 'RefJud_No'),
-    ('RFRMRATE', 'RefJud_Ra'),
-    ('RJUDCNG', 'ReconJud_Cngs'),
-    ('RJUDADH', 'ReconJud_No'),
-    ('RJUDRATE', 'ReconJud_Ra'),
-    ('UMJCCNG', 'UnionMessJews_Cngs')
-])
+JUDHAISM_COLS = {
+    'OJUDCNG': 'OrthJud_Cngs',
+    'OJUDADH': 'OrthJud_No',
+    'OJUDRATE': 'OrthJud_Ra',
+    'CJUDCNG': 'ConsvJud_Cngs',
+    'CJUDADH': 'ConsvJud_No',
+    'CJUDRATE': 'ConsvJud_Ra',
+    'RFRMCNG': 'RefJud_Cngs',
+    'RFRMADH': 'RefJud_No',
+    'RFRMRATE': 'RefJud_Ra',
+    'RJUDCNG': 'ReconJud_Cngs',
+    'RJUDADH': 'ReconJud_No',
+    'RJUDRATE': 'ReconJud_Ra',
+    'UMJCCNG': 'UnionMessJews_Cngs'
+}
+
+# New labels, for membership checks
+STANDARD_LABELS = frozenset(STANDARD_COLS.values())
+JUDHAISM_LABELS = frozenset(JUDHAISM_COLS.values())
+
+# Suffix of fields kept by each how option of read_judaic_relcen
+HOW_SUFFIXES = {'cngs': '_Cngs', 'adhs': '_No', 'rate': '_Ra'}
 
 TO_FRONT = [
     'FIPS', 'STCODE', 'CNTYCODE', 'CNTYNAME', 'STABBR', 'STNAME', 'POP2010'
 ]
 
+# Codebook entry, numbered variable line then its description
+CODEBOOK_RE = re.compile(r'\d+[)][ ]([^\n\r]+)\s+([^\n\r]+)')
+
 
 def reorder_general_cols(df, index=True):
     """Reorder and rename vars."""
 
-    # column when passing codebook with variables in index
-    df = df if index else df.T
-    order = TO_FRONT + df.drop(TO_FRONT, axis=1).columns.tolist()
-    df = df.reindex(columns=order)
-    df = df if index else df.T
+    # index when passing codebook with variables in index,
+    # reordered directly since transposing is slow for wide frames
+    labels = df.columns if index else df.index
+    order = TO_FRONT + labels.drop(TO_FRONT).tolist()
+    df = df.reindex(columns=order) if index else df.reindex(index=order)
 
     return df
 
@@ -65,7 +75,7 @@ def read_cb(fp):
     """
     with open(fp) as f:
         cb_txt = f.read()
-    data = re.findall(r'\d+[)][ ]([^\n\r]+)\s+([^\n\r]+)', cb_txt)
+    data = CODEBOOK_RE.findall(cb_txt)
     df = (pd.DataFrame(data, columns=['VAR', 'DESCRIPTION']).set_index('VAR'))
 
     df = reorder_general_cols(df, index=False)
@@ -73,7 +83,7 @@ def read_cb(fp):
     return df
 
 
-def read_all_denoms(fp):
+def read_all_denoms(fp, columns=None):
     """Reads U.S. Religion Census, 2010 County File.
 
     Religious Congregations and Membership Study,
@@ -86,6 +96,9 @@ def read_all_denoms(fp):
     ----------
     fp : str
         filepath to Stata .DTA file
+    columns : list of str, optional
+        Uppercase labels of fields to read in addition to
+        general fields in TO_FRONT. Default reads all fields.
 
     Returns
     -------
@@ -95,15 +108,25 @@ def read_all_denoms(fp):
     def pad_codes(df):
         """Convert code cols to strings and pad."""
 
-        df.FIPS = code_to_str(df.FIPS, 5)
-        df.STCODE = code_to_str(df.STCODE, 2)
-        df.CNTYCODE = code_to_str(df.CNTYCODE, 3)
+        df['FIPS'] = code_to_str(df['FIPS'], 5)
+        df['STCODE'] = code_to_str(df['STCODE'], 2)
+        df['CNTYCODE'] = code_to_str(df['CNTYCODE'], 3)
 
         return df
 
-    df = (pd.read_stata(fp)
-          .rename(columns=lambda x: x.upper())
-          .pipe(pad_codes)
+    if columns is None:
+        df = pd.read_stata(fp)
+    else:
+        # Stata labels are case-sensitive and not all lower case
+        with pd.read_stata(fp, iterator=True) as reader:
+            labels = {label.upper(): label
+                      for label in reader.variable_labels()}
+        usecols = TO_FRONT + [col for col in columns if col not in TO_FRONT]
+        df = pd.read_stata(fp, columns=[labels[col] for col in usecols])
+    # relabel in place, rather than copying whole frame to rename
+    df.columns = df.columns.str.upper()
+
+    df = (df.pipe(pad_codes)
           .pipe(reorder_general_cols)
           .fillna(0)
           .set_index('FIPS')
@@ -131,7 +154,8 @@ def read_judaic_relcen(fp, how='all', standard_cols=False):
     else:
         cols = JUDHAISM_COLS
 
-    df = (read_all_denoms(fp)
+    # only fields that are kept are read
+    df = (read_all_denoms(fp, columns=list(cols))
           .rename(columns=cols)
           .loc[:, cols.values()]
     )
@@ -141,20 +165,17 @@ def read_judaic_relcen(fp, how='all', standard_cols=False):
     df = df.loc[:, cols.values()]
 
     if how != 'all':
-       if how == 'cngs':
-           suffix = '_Cngs'
-       elif how == 'adhs':
-           suffix = '_No'
-       elif how == 'rate':
-           suffix = '_Ra'
-       else:
-           raise ValueError('Invalid how parameter passed.')
-
-       df = df.select(
-           lambda x: x.endswith(suffix) or x in STANDARD_COLS.values(), axis=1)
-
-       # drop empty
-       df = df.loc[df.select(lambda col: col in JUDHAISM_COLS.values(), axis=1)
-                       .sum(1) > 0]
+        if how not in HOW_SUFFIXES:
+            raise ValueError('Invalid how parameter passed.')
+        suffix = HOW_SUFFIXES[how]
+
+        df = df.loc[:, [col for col in df.columns
+                        if col.endswith(suffix)
+                        or col in STANDARD_LABELS]]
+
+        # drop empty
+        jud_cols = [col for col in df.columns
+                    if col in JUDHAISM_LABELS]
+        df = df.loc[df[jud_cols].sum(1) > 0]
 
     return df
@@ -0,0 +1,30 @@
+import itertools as it
+
+from jdata_counties import JDataCounties
+
+def test_county_cnts(data_dir='../Data/'):
+    """
+    Aggregates JData orgs into county counts for each categorical
+    option and filter, and passes if no exceptions are raised.
+
+    get_county_cnts validates county FIPS codes and that county
+    counts add up to the orgs read.
+    """
+    JDATA_FP        = ''.join([data_dir, 'Schools/jdata_directory.json'])
+    ZIPS_TO_FIPS_FP = ''.join([data_dir, 'ZIP_COUNTY_122016.xlsx'])
+
+    categoricals = ['both', 'denom', 'type']
+    filters = [{}, dict(include='Orth'), dict(include=['DaySch', 'Ref']),
+               dict(exclude='PTSch')]
+
+    jdc = JDataCounties(JDATA_FP, ZIPS_TO_FIPS_FP)
+    for categorical, kwargs in it.product(categoricals, filters):
+        jdc.get_county_cnts(categorical, **kwargs)
+
+    print('County count tests passed: no exceptions raised')
+
+
+if __name__=='__main__':
+
+    DATA_DIR = '../Data/'
+    test_county_cnts(DATA_DIR)
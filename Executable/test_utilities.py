@@ -0,0 +1,41 @@
+import pandas as pd
+
+from utilities import split_state
+
+def test_split_state():
+    """
+    Splits states off several columns in one pass, and passes if each
+    gets its own state column next to it and ambiguous suffixes raise.
+    """
+    df = pd.DataFrame({
+        'County': ['Broward County, FL', 'Kings County,NY'],
+        'Region': ['South Florida, FL', 'Brooklyn , Queens, NY'],
+    })
+
+    split = split_state(df, ['County', 'Region'], suffix=['State', 'States'])
+    assert split.columns.tolist() == ['County', 'County_State',
+                                      'Region', 'Region_States']
+    assert split.County.tolist() == ['Broward County', 'Kings County']
+    assert split.County_State.tolist() == ['FL', 'NY']
+    assert split.Region.tolist() == ['South Florida', 'Brooklyn, Queens']
+    assert split.Region_States.tolist() == ['FL', 'NY']
+
+    split = split_state(df, ['County', 'Region'], suffix='State')
+    assert split.columns.tolist() == ['County', 'County_State',
+                                      'Region', 'Region_State']
+
+    # One 'State' column for both, or too few suffixes
+    for suffix in [None, ['State']]:
+        try:
+            split_state(df, ['County', 'Region'], suffix=suffix)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('Expected ValueError for {}'.format(suffix))
+
+    print('split_state tests passed')
+
+
+if __name__=='__main__':
+
+    test_split_state()
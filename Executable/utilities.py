@@ -1,3 +1,11 @@
+import contextlib
+import copy
+import functools
+import os
+import re
+import tempfile
+
+import numpy as np
 import pandas as pd
 from IPython.display import display
 from scipy.stats import boxcox
@@ -8,6 +16,33 @@ DATA_DIR = '../Data/'
 STATE_TO_ABBR_FP = ''.join([DATA_DIR, 'States-to-Abbrevs.csv'])
 FIPS_CODES_FP = ''.join([DATA_DIR, 'Census-2010-County-FIPS.txt'])
 
+# trailing state after last comma, e.g. 'Broward County, FL'
+STATE_RE = re.compile(r'^\s*(?:(?P<rest>.*?)\s*,)?\s*(?P<state>[^,]*?)\s*$')
+# inner comma with any padding, rejoined as ', '
+COMMA_RE = re.compile(r'\s*,\s*')
+
+
+def cached_read(fn):
+    """Caches file reader on filepath and modification time, so a
+    changed file is re-read.
+
+    Reader takes filepath as first argument. Each call returns a copy
+    of the cached result, so changes by caller do not leak into cache.
+    """
+    @functools.lru_cache(maxsize=4)
+    def read(fp, mtime, *args, **kwargs):
+        return fn(fp, *args, **kwargs)
+
+    @functools.wraps(fn)
+    def wrapper(fp, *args, **kwargs):
+        result = read(fp, os.path.getmtime(fp), *args, **kwargs)
+        if isinstance(result, (pd.DataFrame, pd.Series)):
+            return result.copy()
+        return copy.deepcopy(result)
+
+    wrapper.cache_clear = read.cache_clear
+    return wrapper
+
 
 def are_valid_state_abbrevs(df, st_col):
     """Check valid state abbrevs."""
@@ -23,7 +58,9 @@ def display_cb(df, max_colwidth=80):
 
 def remove_state(col):
     """Remove trailing states from city/county feature."""
-    return col.map(lambda x: ', '.join([x.strip() for x in x.split(',')][:-1]))
+    return (col.str.extract(STATE_RE)['rest'].fillna('')
+            .str.replace(COMMA_RE, ', ', regex=True)
+            )
 
 
 def split_state(df, col, suffix=None):
@@ -36,47 +73,113 @@ def split_state(df, col, suffix=None):
     ----------
     df : pandas.DataFrame
         To process and return
-    col : str
-        Label of location column from which to split state off
-    suffix : str
+    col : str or list of str
+        Label of location column from which to split state off,
+        or labels of several to split in one pass
+    suffix : str or list of str
         To add to the new state column, separated by '_'
-        If None: new column is named 'State'
+        If None: new column is named 'State', so only one col
+        If list, one suffix for each col
 
     Returns
     -------
     df : pandas.DataFrame with additional column for state
     """
-    state_col = 'State' if suffix is None else '_'.join([col, suffix])
-    # Create state column
-    df.loc[:, state_col] = df[col].map(lambda x: x.split(',')[-1].strip())
-    df.loc[:, col] = remove_state(df[col])
-
-    # readable order of city/county, state
+    cols = [col] if isinstance(col, str) else list(col)
+    suffixes = suffix if isinstance(suffix, list) else [suffix] * len(cols)
+    if len(suffixes) != len(cols):
+        raise ValueError('Pass one suffix for each col.')
+    state_cols = ['State' if suffix is None else '_'.join([col, suffix])
+                  for col, suffix in zip(cols, suffixes)]
+    if len(set(state_cols)) != len(state_cols):
+        raise ValueError(
+            'State columns must be unique, pass a suffix for each col.')
+
+    new_cols = {}
     all_cols = df.columns.tolist()
-    all_cols.insert(all_cols.index(col) + 1, state_col)
-    df = df.reindex(columns=all_cols[:-1])
+    for col, state_col in zip(cols, state_cols):
+        parts = df[col].str.extract(STATE_RE)
+        new_cols[col] = (parts['rest'].fillna('')
+                         .str.replace(COMMA_RE, ', ', regex=True)
+                         )
+        new_cols[state_col] = parts['state']
+
+        # readable order of city/county, state
+        all_cols.insert(all_cols.index(col) + 1, state_col)
+
+    df = df.assign(**new_cols).reindex(columns=all_cols)
 
     return df
 
 
+def write_parquet_cache(df, cache_fp):
+    """Writes Parquet copy of a table read from its source file.
+
+    Written to a temporary file then renamed, so other readers never
+    load a partially written cache. If it cannot be written, e.g. in a
+    read-only data directory or without a Parquet engine, the temporary
+    file is removed and callers keep using the table already read.
+
+    Returns
+    -------
+    written : bool
+    """
+    tmp_fp = None
+    try:
+        fd, tmp_fp = tempfile.mkstemp(
+            suffix='.parquet',
+            dir=os.path.dirname(os.path.abspath(cache_fp)))
+        os.close(fd)
+        df.to_parquet(tmp_fp, index=False)
+        os.replace(tmp_fp, cache_fp)
+    except (OSError, ImportError):
+        if tmp_fp is not None:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_fp)
+        return False
+
+    return True
+
+
 def read_state_to_abbr(fp=STATE_TO_ABBR_FP):
     """Read conversion table, state names to abbreviations."""
-    return pd.read_csv(fp, index_col='State', squeeze=True)
+    return _read_state_to_abbr(fp)
+
+
+@cached_read
+def _read_state_to_abbr(fp):
+    """Reads state conversion table."""
+    return pd.read_csv(fp, index_col='State').squeeze('columns')
 
 
 def state_to_abbr(col, lookup_fp=STATE_TO_ABBR_FP):
     """Convert names of states to their abbreviations."""
-    abbr_df = read_state_to_abbr(lookup_fp)
-    abbrevs = col.map(lambda x: abbr_df[x.title()])
+    lookup = read_state_to_abbr(lookup_fp).to_dict()
+    # each distinct name is converted once, then mapped by hash
+    # lookup, which also keeps categoricals categorical
+    names = col.dropna().unique()
+    missing = [name for name in names if name.title() not in lookup]
+    if missing:
+        raise KeyError('Unknown state names: {}'.format(missing))
+
+    abbrs = {name: lookup[name.title()] for name in names}
+    abbrevs = col.map(abbrs)
     return abbrevs
 
 
 def code_to_str(col, width):
     """Convert FIPS to proper string format"""
-    col = (col.astype(str).str.pad(width, side='left', fillchar='0'))
+    # numpy ints only, nullable Int64 (also kind 'i') may hold NA
+    if isinstance(col.dtype, np.dtype) and col.dtype.kind in 'iu':
+        # pad in numpy's string kernels, no per-value Python calls
+        codes = np.char.zfill(col.to_numpy().astype(str), width)
+        col = pd.Series(codes, index=col.index, name=col.name)
+    else:
+        col = col.astype(str).str.zfill(width)
     return col
 
 
+@cached_read
 def read_fips_codes(fp):
     """Read 2010 Census County FIPS codes.
 
@@ -113,7 +216,7 @@ def read_fips_codes(fp):
     """
     columns = ['STATE', 'STATEFP', 'COUNTYFP', 'COUNTYNAME', 'CLASSFP']
     df = pd.read_csv(fp, names=columns, header=None, dtype=str)
-    df.loc[:, 'FIPS'] = df.STATEFP.str.cat(df.COUNTYFP)
+    df['FIPS'] = df.STATEFP + df.COUNTYFP  # state then county code
     df = df.set_index('FIPS')
 
     return df
@@ -136,8 +239,15 @@ def fips_to_state_abbr(fips_col, fips_ref_fp):
                   .set_index('STATEFP')
                   .drop_duplicates('STATE')
                   .loc[:, 'STATE']
+                  .to_dict()
                   )
-    abbr_col = fips_col.map(lambda x: fips_codes[x[:2]])
+    # state FIPS code is first two digits
+    state_fips = fips_col.str[:2]
+    missing = sorted(set(state_fips.dropna()) - fips_codes.keys())
+    if missing:
+        raise KeyError('Unknown state FIPS codes: {}'.format(missing))
+
+    abbr_col = state_fips.map(fips_codes)
 
     return abbr_col
 
@@ -184,16 +294,24 @@ def is_outlier_instance(data, thresh=2):
 
     df = df.select_dtypes(['float', 'int'])
 
-    is_outlier = df.apply(is_outlier_val)
+    # is_outlier_val for all features at once
+    quartiles = df.quantile(q=[.25, .75])
+    q1, q3 = quartiles.loc[.25], quartiles.loc[.75]
+    step = 1.5 * (q3 - q1)
+    lo, hi = q1 - step, q3 + step
+
+    is_outlier = df.lt(lo, axis=1) | df.gt(hi, axis=1)
 
     return is_outlier.sum(1) >= thresh
 
 
 def rate_to_perc(df, rate_suffix, perc_suffix):
     """Convert rate variables to percentages."""
-    for name, col in df.items():
-        if name.endswith(rate_suffix):
-            col /= 10
-            new_name = name.replace(rate_suffix, perc_suffix)
-            df = df.rename(columns={name: new_name})
+    rate_cols = [name for name in df.columns if name.endswith(rate_suffix)]
+
+    # rates are per 1000, divided as whole columns in one new frame
+    df = (df.assign(**{name: df[name] / 10 for name in rate_cols})
+          .rename(columns={name: name.replace(rate_suffix, perc_suffix)
+                           for name in rate_cols})
+          )
     return df
@@ -2,11 +2,73 @@
 
 import logging
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-from lxml import html
+from lxml import etree, html
 from pandas import DataFrame
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# City, state and zip line of address, allows for missing fields
+CITY_STATE_RE = re.compile(r'''
+        (?P<City>    [^,]*?)?,[ ]
+        (?P<State>   [A-Z]{2})? ([ ]
+        (?P<Zip>     (\d{5}(-\d{4})?)|                # US zip
+                     ([A-Z0-9]{3}[ ][A-Z0-9]{3}))$)?  # Canadian zip
+        ''', re.VERBOSE)
+
+PHONE_RE = re.compile(r'(?P<Phone>(\d{3}-)?\d{3}-\d{4})')
+
+
+def make_session(max_requests):
+    """Creates HTTP session that reuses connections and retries failures.
+
+    Failed connections (e.g. SSL errors), server errors and rate
+    limited responses are retried with exponential backoff, waiting
+    longer if server sends a Retry-After header.
+
+    Parameters
+    ----------
+    max_requests : int
+        Maximum number of requests to attempt per URL.
+
+    Returns
+    -------
+    session : requests.Session
+    """
+    retry = Retry(total=max_requests-1, backoff_factor=0.5,
+                  status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def get_tree(session, url, logger):
+    """Requests page and parses its HTML, logging any failed request.
+
+    Parameters
+    ----------
+    session : requests.Session
+    url : str
+    logger : logging.Logger
+
+    Returns
+    -------
+    tree : lxml.html.HtmlElement
+    """
+    try:
+        request = session.get(url)
+    except requests.exceptions.RequestException as e:
+        logger.error('For {}: {}'.format(url, e))
+        raise
+
+    return html.fromstring(request.content)
 
 
 class JDataDirScraper():
@@ -46,8 +108,21 @@ class JDataDirScraper():
         Search fields that represent organization categories.
         Length is hard-wired, would miss 3rd etc. category
         fields.
+    RECORD_COLS : tuple of str
+        Fields parsed from organization listings, in output order
+        and followed by category fields.
     MAX_REQUESTS : int
-        Number of times to try
+        Maximum number of requests to attempt per URL.
+    MAX_WORKERS : int
+        Number of directory pages requested concurrently, each worker
+        with its own session.
+    PAUSE : float
+        Minimum seconds between starts of requests, shared by all
+        workers so overall rate does not grow with MAX_WORKERS. Can
+        be set to 0 to only back off when server rate limits requests.
+    CATEGORY_XP : lxml.etree.XPath
+        Selects list items of a search field's categories, with field
+        name passed as `field` variable.
     """
 
     logging.basicConfig(filename='jdata_scraper.log', filemode='w',
@@ -57,7 +132,14 @@ class JDataDirScraper():
     BASE_URL = 'https://www.jdata.com/tools/directory/'
     OUT_FILEPATH = './jdata_directory.json'
     CAT_FIELDS = ('Type of Organization', 'Denominations')
+    RECORD_COLS = ('Name', 'Address', 'City', 'State', 'Zip', 'Country',
+                   'Phone', 'URL')
     MAX_REQUESTS = 10
+    MAX_WORKERS = 4
+    PAUSE = 1
+    CATEGORY_XP = etree.XPath(
+        '//fieldset[child::legend[text()=$field]]/ul/li'
+        )
 
     def __init__(self, base_url=BASE_URL):
         self._logger = logging.getLogger(__name__)
@@ -67,17 +149,11 @@ class JDataDirScraper():
         self.n = 0
         self.df = None
 
-        request = requests.get(self.base_url)
-        self._base_tree = html.fromstring(request.content)
-        for _ in range(self.MAX_REQUESTS):
-            try:
-                request = requests.get(base_url)
-                self._base_tree = html.fromstring(request.content)
-            except requests.exceptions.SSLError as e:
-                continue
-            break
-        else:
-            self._logger.error('For {}: {}'.format(self.url, e))
+        self._local = threading.local()
+        self._pause_lock = threading.Lock()
+        self._next_request = 0
+        self._base_tree = get_tree(self._get_session(), self.base_url,
+                                   self._logger)
 
         self.categories = {}
         for field in (self.field1, self.field2):
@@ -102,15 +178,14 @@ class JDataDirScraper():
             names and data for URL-based query of directory subset.
         """
         cats = {}
-        xp = '//fieldset[child::legend[text()="{}"]]/ul/li'.format(field)
-
-        for li in self._base_tree.xpath(xp):
+        for li in self.CATEGORY_XP(self._base_tree, field=field):
             cat_name = li.findtext('label')
 
             # Field and value used to query subsets of organizations of a
             # particular category (appended to base URL).
-            in_name = li.find('input').attrib['name']
-            in_val = li.find('input').attrib['value'].replace(' ', '+')
+            input_ = li.find('input')
+            in_name = input_.attrib['name']
+            in_val = input_.attrib['value'].replace(' ', '+')
 
             cats.update({
                 cat_name: {'in_name': in_name, 'in_val': in_val}
@@ -137,36 +212,116 @@ class JDataDirScraper():
 
         Returns
         -------
-        records : list of dicts
-            Each element is a record, with field to value dict mapping.
+        records : dict of lists
+            Each field maps to its values for every extracted record.
+            Categories are None for records from 'All' queries.
+        """
+        records = {col: [] for col in
+                   self.RECORD_COLS + (self.field1, self.field2)}
+
+        query_urls = self._query_urls()
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            # Subsets with 'All' for either field are requested first.
+            # A category without records there can have none when
+            # crossed with a category of the other field, so those
+            # queries are skipped.
+            all_urls = [q for q in query_urls if 'All' in q[:2]]
+            pages = dict(zip(all_urls,
+                             executor.map(self._get_page, all_urls)))
+            empty1 = {cat1 for (cat1, cat2, _), page in pages.items()
+                      if cat2 == 'All' and not page.n}
+            empty2 = {cat2 for (cat1, cat2, _), page in pages.items()
+                      if cat1 == 'All' and not page.n}
+            cross_urls = [q for q in query_urls
+                          if 'All' not in q[:2]
+                          and q[0] not in empty1 and q[1] not in empty2]
+            pages.update(zip(cross_urls,
+                             executor.map(self._get_page, cross_urls)))
+
+        # Records are collected in query order, as in a sequential
+        # scrape of every combination.
+        for cat1, cat2, url in query_urls:
+            page = pages.get((cat1, cat2, url))
+            if page is None or not page.n:
+                continue
+            if cat1 == cat2 == 'All':
+                self.n = page.n
+            queried_data = page.extract_page()
+            for col in self.RECORD_COLS:
+                records[col] += [record.get(col) for record in queried_data]
+            for field, cat in ((self.field1, cat1), (self.field2, cat2)):
+                records[field] += ([None if cat == 'All' else cat]
+                                   * len(queried_data))
+
+        return records
+
+    def _get_page(self, query_url):
+        """Requests page of directory subset, waiting its turn first.
+
+        Parameters
+        ----------
+        query_url : 3-tuple
+            Category of first field, category of second field and URL
+            for query of their directory subset.
+
+        Returns
+        -------
+        page : JDataPage
+        """
+        cat1, cat2, url = query_url
+        self._logger.info(
+            'Extracting from: {}\nType: {}\nDenom: {} ...'
+            .format(url, cat2, cat1))
+        self._wait_turn()
+        page = JDataPage(url, session=self._get_session())
+
+        if not page.n:
+            self._logger.info('No records found for this subset.')
+
+        return page
+
+    def _get_session(self):
+        """Gets session of current thread, as sessions are not
+        thread-safe.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = make_session(self.MAX_REQUESTS)
+            self._local.session = session
+
+        return session
+
+    def _wait_turn(self):
+        """Sleeps until PAUSE seconds after last request started by
+        any worker.
         """
-        records =[]
+        with self._pause_lock:
+            now = time.monotonic()
+            wait = self._next_request - now
+            self._next_request = max(self._next_request, now) + self.PAUSE
+        if wait > 0:
+            time.sleep(wait)
+
+    def _query_urls(self):
+        """Builds URLs for every combination of category queries.
+
+        Returns
+        -------
+        query_urls : list of 3-tuples
+            Category of first field, category of second field and URL
+            for query of their directory subset.
+        """
+        query_urls = []
+        prefix = ''.join([self.base_url, 'results?fKeyword='])
         for cat1, cat1_in in self.categories[self.field1].items():
+            query1 = '{}&{}={}'.format(prefix, cat1_in['in_name'],
+                                       cat1_in['in_val'])
             for cat2, cat2_in in self.categories[self.field2].items():
+                query_url = '{}&{}={}'.format(query1, cat2_in['in_name'],
+                                              cat2_in['in_val'])
+                query_urls.append((cat1, cat2, query_url))
 
-                query_url = (
-                    'results?fKeyword=&{n_0}={v_0}&{n_1}={v_1}'
-                    .format(n_0=cat1_in['in_name'], v_0=cat1_in['in_val'],
-                            n_1=cat2_in['in_name'], v_1=cat2_in['in_val'])
-                    )
-                query_url = ''.join([self.base_url, query_url])
-                self._logger.info(
-                    'Extracting from: {}\nType: {}\nDenom: {} ...'
-                    .format(query_url, cat2, cat1))
-                page = JDataPage(query_url)
-
-                if not page.n:
-                    self._logger.info('No records found for this subset.')
-                else:
-                    if cat1 == cat2 == 'All':
-                        self.n = page.n
-                    queried_data = page.extract_page()
-                    for record in queried_data:
-                        record.update({self.field1: cat1, self.field2: cat2})
-                    records += queried_data
-                time.sleep(1)
-
-        return records
+        return query_urls
 
     def _merge_duplicates(self, records):
         """Eliminates duplicated records from 'All' queries.
@@ -177,35 +332,29 @@ class JDataDirScraper():
 
         Parameters
         ----------
-        records : list of dicts
-            Each element is a record, with field to value dict mapping.
+        records : dict of lists
+            Each field maps to its values for every extracted record.
 
         Returns
         -------
         df : Dataframe
             Records of organizations
         """
-        ordered_cols = [
-            'Name', 'Address', 'City', 'State', 'Zip', 'Country',
-            'Phone', 'URL', self.field1, self.field2
-            ]
-        df = (DataFrame(records)
-              .reindex(columns=ordered_cols)
-              .replace({self.field1: {'All': None},
-                        self.field2: {'All': None}})
-              )
+        df = DataFrame(records)
         # Extract single instance of any full duplicates, i.e. those that
         # exist in the source database regardless of extraction method.
         cols = df.columns.tolist()
         exact_dupes = df[df.duplicated()].drop_duplicates(subset=cols[:-2])
 
-        # DataFrame is sorted with stable sorting algorithm mergesort.
-        # This ensures that as rows are sorted on each column moving
-        # from right to left, rows with most non-NaN vals for category
-        # fields (last two cols) are at the top of groups of duplicates.
-        # Top most row is then kept in dupe drop.
-        df = df.sort_values(cols, kind='mergesort')
-        df = df.drop_duplicates(subset=cols[:-2])
+        # Sorting only on category fields (last two cols), NaNs last,
+        # puts rows with most non-NaN vals for them at the top of groups
+        # of duplicates. Top most row is then kept in dupe drop, and the
+        # remaining unique rows are sorted on the other fields. Sorts use
+        # stable algorithm mergesort so ties keep extraction order.
+        df = (df.sort_values(cols[-2:], kind='mergesort')
+              .drop_duplicates(subset=cols[:-2])
+              .sort_values(cols[:-2], kind='mergesort')
+              )
 
         total_extracted = len(df) + len(exact_dupes)
         if total_extracted == self.n:
@@ -232,6 +381,9 @@ class JDataPage():
     ----------
     url : str
         URL is for a single page containing organization records.
+    session : requests.Session, optional
+        Session shared across pages to reuse connections, created
+        if not given.
 
     Attributes
     ----------
@@ -244,28 +396,26 @@ class JDataPage():
     ---------
     MAX_REQUESTS : int
         Maximum number of requests to attempt
+    COUNT_XP : lxml.etree.XPath
+        Selects element with number of records in page header.
+    TITLES_XP : lxml.etree.XPath
+        Selects title elements of organization records.
     """
 
     MAX_REQUESTS = 10
+    COUNT_XP = etree.XPath('//*[@id="pageContentWrapper"]//strong')
+    TITLES_XP = etree.XPath('//*[@id="pageContentWrapper"]//h7')
 
-    def __init__(self, url):
+    def __init__(self, url, session=None):
         self._logger = logging.getLogger(__name__)
         self.records = []
         self.url = url
 
-        for _ in range(self.MAX_REQUESTS):
-            try:
-                request = requests.get(self.url)
-                self._tree = html.fromstring(request.content)
-            except requests.exceptions.SSLError as e:
-                continue
-            break
-        else:
-            self._logger.error('For {}: {}'.format(self.url, e))
+        if session is None:
+            session = make_session(self.MAX_REQUESTS)
+        self._tree = get_tree(session, self.url, self._logger)
 
-        self.n = int(self._tree.xpath(
-            '//*[@id="pageContentWrapper"]//strong')[0].text
-            )
+        self.n = int(self.COUNT_XP(self._tree)[0].text)
 
     def extract_page(self):
         """Parses list of organizations and their information.
@@ -275,19 +425,7 @@ class JDataPage():
         self.records : list of dicts
             Each element is a record, with field to value dict mapping.
         """
-        titles = self._tree.xpath(
-            '//*[@id="pageContentWrapper"]//h7'
-            )
-
-        # Allows for missing fields
-        city_state_re = re.compile(r'''
-                (?P<City>    [^,]*?)?,[ ]
-                (?P<State>   [A-Z]{2})? ([ ]
-                (?P<Zip>     (\d{5}(-\d{4})?)|                # US zip
-                             ([A-Z0-9]{3}[ ][A-Z0-9]{3}))$)?  # Canadian zip
-                ''', re.VERBOSE)
-
-        phone_re = re.compile(r'(?P<Phone>(\d{3}-)?\d{3}-\d{4})')
+        titles = self.TITLES_XP(self._tree)
 
         for title in titles:
             name = title.text
@@ -301,7 +439,7 @@ class JDataPage():
 
             # Starts with top line of address, will update Address later
             # with 2nd line of address or any other text not matched
-            # to city/state/zip and phone regular expressions above.
+            # to city/state/zip and phone regular expressions.
             addr = details.text.strip() if details.text is not None else ''
             record.update(dict(Address=addr))
 
@@ -313,20 +451,23 @@ class JDataPage():
                 line = br.tail.strip()
                 if not line:
                     continue
-                ph = phone_re.search(line)
+                ph = PHONE_RE.search(line)
                 if ph:
                     record.update(ph.groupdict())
                     continue
-                city_state = city_state_re.search(line)
+                city_state = CITY_STATE_RE.search(line)
                 if city_state:
                     record.update(city_state.groupdict())
                     continue
 
                 addr = '; '.join([addr, line])
                 record.update(dict(Address=addr))
-                self._logger.warn(u'2-line address or unusual format'
-                                  u'\n\tName: {}\n\tInfo: {}\n\tAddress: {}'
-                                  .format(name, html.tostring(details), addr))
+                # Serializing details is only worth it if logged
+                if self._logger.isEnabledFor(logging.WARNING):
+                    self._logger.warning(
+                        u'2-line address or unusual format'
+                        u'\n\tName: {}\n\tInfo: {}\n\tAddress: {}'
+                        .format(name, html.tostring(details), addr))
 
             zip_ = record.get('Zip')
             if zip_: